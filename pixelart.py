@@ -1,15 +1,95 @@
-import sys, json, os
-from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QPushButton, QFileDialog, QColorDialog, QFontDialog
+import sys, json, os, functools
+import numpy as np
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton
 from PyQt6.QtGui import QImage, QPixmap, QColor, QPainter, QFont
-from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtCore import Qt, QPoint, QRect, QLine, QTimer
+
+try:
+    from numba import njit
+except ImportError:
+    # numba es opcional: sin él, _flood_fill se ejecuta como Python normal
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # Archivo donde guardaremos la configuración del tema
 CONFIG_FILE = "config.json"
+# Color del lienzo vacío / borrador (blanco en RGB32)
+WHITE_RGB = 0xFFFFFFFF
+
 
-class PixelArtCanvas(QLabel):
+@njit(cache=True)
+def _flood_fill(buf, x, y, replacement):
+    """
+    Rellena con replacement la zona de cuadros contiguos (4 vecinos) que tienen
+    el mismo color que (x, y). Usa una pila explícita en vez de recursión.
+    Devuelve cuántos cuadros se han cambiado.
+    """
+    target = buf[y, x]
+    if target == replacement:
+        return 0
+    height, width = buf.shape
+    filled = 0
+    stack = [(x, y)]
+    while stack:
+        cx, cy = stack.pop()
+        if buf[cy, cx] != target:
+            continue
+        buf[cy, cx] = replacement
+        filled += 1
+        if cx > 0:
+            stack.append((cx - 1, cy))
+        if cx < width - 1:
+            stack.append((cx + 1, cy))
+        if cy > 0:
+            stack.append((cx, cy - 1))
+        if cy < height - 1:
+            stack.append((cx, cy + 1))
+    return filled
+
+
+@functools.lru_cache(maxsize=32)
+def _qcolor(name):
+    """
+    QColor a partir de su nombre (ej. "#b57edc"), guardado para no volver a interpretarlo.
+    No modificar el objeto devuelto: es compartido.
+    """
+    return QColor(name)
+
+
+@functools.lru_cache(maxsize=32)
+def _qfont(family):
+    """
+    QFont a partir del nombre de la familia, guardado igual que _qcolor.
+    """
+    return QFont(family)
+
+
+def line_cells(x0, y0, x1, y1):
+    """
+    Devuelve los cuadros de la línea entre (x0, y0) y (x1, y1), ambos incluidos
+    (algoritmo de Bresenham).
+    """
+    cells = []
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    while True:
+        cells.append((x0, y0))
+        if x0 == x1 and y0 == y1:
+            return cells
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+class PixelArtCanvas(QWidget):
     """
     Clase que representa el lienzo de pixel art.
-    Hereda de QLabel y muestra un QImage escalado con cuadrícula.
+    Hereda de QWidget y pinta ella misma un QImage escalado con cuadrícula.
     """
     def __init__(self, width=60, height=60, display_size=600):
         super().__init__()
@@ -18,102 +98,224 @@ class PixelArtCanvas(QLabel):
         self.height_px = height
         # Tamaño en pantalla (ej. 600x600 para que se vean grandes los cuadros)
         self.display_size = display_size
+        self.setFixedSize(display_size, display_size)
+        # paintEvent cubre todo el área con display_pixmap: Qt no necesita pintar el fondo antes
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        # Posición en pantalla de cada línea de la cuadrícula (bordes de los cuadros)
+        step_x = display_size / width
+        step_y = display_size / height
+        self._grid_xs = [int(i * step_x) for i in range(width + 1)]
+        self._grid_ys = [int(j * step_y) for j in range(height + 1)]
 
-        # Imagen interna donde se guardan los colores reales
-        self.image = QImage(width, height, QImage.Format.Format_RGB32)
-        self.image.fill(Qt.GlobalColor.white)  # inicializa todo en blanco
+        # Colores reales del lienzo: una palabra RGB32 por cuadro, todo en blanco al inicio.
+        # Es el mismo formato que display_pixmap, así que copiarlo a pantalla no necesita conversión
+        self.buf = np.full((height, width), WHITE_RGB, dtype=np.uint32)
+        # QImage que usa directamente la memoria de self.buf (no la copia),
+        # así pintar es escribir en el array sin pasar por setPixelColor
+        self.image = QImage(self.buf.data, width, height, width * 4, QImage.Format.Format_RGB32)
 
         # Estado de dibujo y color actual del pincel
         self.drawing = False
+        self.fill_mode = False  # True → el clic izquierdo rellena un área (cubo)
+        self.last_cell = None  # último cuadro pintado en el trazo actual
         self.brush_color = QColor("#ff69b4")  # color inicial rosa girly 💖
+        self.brush_rgb = self.brush_color.rgb()  # rgb() siempre lleva alfa 0xFF
+        # Última imagen exportada a 1080x1080; se descarta al pintar
+        self._export_cache = None
+
+        # Factores para pasar de coordenadas del ratón a cuadros (se actualizan en resizeEvent)
+        self.update_scale()
+
+        # Cuadrícula pre-renderizada (no cambia mientras se dibuja)
+        self.build_grid_overlay()
 
+        # Pixmap que se muestra en pantalla; se reutiliza y se pinta encima en su sitio
+        self.display_pixmap = QPixmap(self.display_size, self.display_size)
         # Actualiza la vista inicial
         self.update_display()
 
+    def resizeEvent(self, event):
+        self.update_scale()
+        super().resizeEvent(event)
+
+    def update_scale(self):
+        """
+        Guarda cuántos cuadros del lienzo hay por píxel de pantalla.
+        """
+        self._x_scale = self.width_px / max(self.width(), 1)
+        self._y_scale = self.height_px / max(self.height(), 1)
+
     # --- Eventos del mouse ---
     def mousePressEvent(self, event):
+        # Clic izquierdo con el cubo activo → rellenar área
+        if event.button() == Qt.MouseButton.LeftButton and self.fill_mode:
+            self.fill_area(event.pos())
         # Clic izquierdo → pintar
-        if event.button() == Qt.MouseButton.LeftButton:
+        elif event.button() == Qt.MouseButton.LeftButton:
             self.drawing = True
-            self.paint_pixel(event.pos())
+            self._write_cell(event.pos(), self.brush_rgb)
         # Clic derecho → borrar (resetear a blanco)
         elif event.button() == Qt.MouseButton.RightButton:
-            self.reset_pixel(event.pos())
+            self._write_cell(event.pos(), WHITE_RGB)
 
     def mouseDoubleClickEvent(self, event):
         # Doble clic → resetear a blanco
-        self.reset_pixel(event.pos())
+        self._write_cell(event.pos(), WHITE_RGB)
 
     def mouseMoveEvent(self, event):
-        # Arrastrar con clic izquierdo → pintar varios píxeles
+        # Arrastrar con clic izquierdo → pintar todos los cuadros desde el último
         if self.drawing and event.buttons() & Qt.MouseButton.LeftButton:
-            self.paint_pixel(event.pos())
+            self.paint_stroke(event.pos())
 
     def mouseReleaseEvent(self, event):
         # Al soltar el botón → detener dibujo
         self.drawing = False
+        self.last_cell = None
 
     # --- Métodos de dibujo ---
-    def paint_pixel(self, pos: QPoint):
+    def pos_to_cell(self, pos: QPoint):
+        """
+        Convierte coordenadas del ratón a coordenadas del lienzo.
+        """
+        return int(pos.x() * self._x_scale), int(pos.y() * self._y_scale)
+
+    def _set_cell(self, x, y, rgb):
         """
-        Pinta un píxel en la posición indicada con el color actual del pincel.
+        Escribe el color en la imagen interna sin tocar la pantalla.
+        Devuelve False si no hay nada que repintar: el cuadro queda fuera
+        del lienzo o ya tenía ese color.
         """
-        # Convertir coordenadas del ratón a coordenadas del lienzo
-        x = int(pos.x() * self.width_px / self.width())
-        y = int(pos.y() * self.height_px / self.height())
         if 0 <= x < self.width_px and 0 <= y < self.height_px:
-            self.image.setPixelColor(x, y, self.brush_color)
-            self.update_display()
+            if self.buf[y, x] == rgb:
+                return False
+            self.buf[y, x] = rgb
+            self._export_cache = None
+            return True
+        return False
+
+    def _write_cell(self, pos: QPoint, rgb):
+        """
+        Pinta el cuadro bajo la posición indicada con el color dado
+        (el del pincel para pintar, WHITE_RGB para borrar).
+        """
+        x, y = self.pos_to_cell(pos)
+        self.last_cell = (x, y)
+        if self._set_cell(x, y, rgb):
+            self.update_cells([(x, y)], rgb)
 
-    def reset_pixel(self, pos: QPoint):
+    def fill_area(self, pos: QPoint):
         """
-        Restaura un píxel a blanco (borrador).
+        Rellena con el color del pincel el área del mismo color bajo el ratón.
         """
-        x = int(pos.x() * self.width_px / self.width())
-        y = int(pos.y() * self.height_px / self.height())
+        x, y = self.pos_to_cell(pos)
         if 0 <= x < self.width_px and 0 <= y < self.height_px:
-            self.image.setPixelColor(x, y, QColor("white"))
-            self.update_display()
+            if _flood_fill(self.buf, x, y, self.brush_rgb):
+                self._export_cache = None
+                self.update_display()
+
+    def set_fill_mode(self, enabled):
+        """
+        Activa o desactiva la herramienta de relleno (cubo).
+        """
+        self.fill_mode = enabled
+
+    def paint_stroke(self, pos: QPoint):
+        """
+        Pinta la línea de cuadros entre la muestra anterior del ratón y la actual,
+        así un arrastre rápido no deja huecos. La pantalla se actualiza una sola vez.
+        """
+        x, y = self.pos_to_cell(pos)
+        if self.last_cell is None:
+            cells = [(x, y)]
+        else:
+            cells = line_cells(*self.last_cell, x, y)
+        self.last_cell = (x, y)
+        painted = [(cx, cy) for cx, cy in cells if self._set_cell(cx, cy, self.brush_rgb)]
+        if painted:
+            self.update_cells(painted, self.brush_rgb)
+
+    def build_grid_overlay(self):
+        """
+        Dibuja la cuadrícula pastel una sola vez sobre un QPixmap transparente.
+        Hay que volver a llamarla si cambia display_size.
+        """
+        self.grid_overlay = QPixmap(self.display_size, self.display_size)
+        self.grid_overlay.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(self.grid_overlay)
+        painter.setPen(_qcolor("#d8b0ff"))  # bordes morados pastel
+        # Dibujar todas las líneas verticales y horizontales de una vez
+        lines = [QLine(x, 0, x, self.display_size) for x in self._grid_xs]
+        lines += [QLine(0, y, self.display_size, y) for y in self._grid_ys]
+        painter.drawLines(lines)
+        painter.end()
 
     def update_display(self):
         """
-        Escala la imagen interna para mostrarla en pantalla
-        y dibuja una cuadrícula pastel encima.
-        """
-        scaled = self.image.scaled(self.display_size, self.display_size,
-                                   Qt.AspectRatioMode.IgnoreAspectRatio,
-                                   Qt.TransformationMode.FastTransformation)
-
-        pixmap = QPixmap.fromImage(scaled)
-        painter = QPainter(pixmap)
-        painter.setPen(QColor("#d8b0ff"))  # bordes morados pastel
-        step = self.display_size / self.width_px
-        # Dibujar líneas verticales y horizontales
-        for i in range(self.width_px + 1):
-            painter.drawLine(int(i * step), 0, int(i * step), self.display_size)
-        for j in range(self.height_px + 1):
-            painter.drawLine(0, int(j * step), self.display_size, int(j * step))
+        Dibuja la imagen interna escalada sobre el pixmap de pantalla
+        y pega encima la cuadrícula pastel ya dibujada.
+        Solo hace falta al crear el lienzo o si cambia su tamaño.
+        """
+        painter = QPainter(self.display_pixmap)
+        # Sin SmoothPixmapTransform el escalado es por vecino más cercano,
+        # igual que FastTransformation, y no crea una QImage intermedia
+        painter.drawImage(self.display_pixmap.rect(), self.image)
+        painter.drawPixmap(0, 0, self.grid_overlay)
+        painter.end()
+        self.update()
+
+    def cell_rect(self, x, y):
+        """
+        Devuelve el rectángulo en pantalla que ocupa el cuadro (x, y).
+        """
+        left, right = self._grid_xs[x], self._grid_xs[x + 1]
+        top, bottom = self._grid_ys[y], self._grid_ys[y + 1]
+        return QRect(left, top, right - left, bottom - top)
+
+    def update_cells(self, cells, rgb):
+        """
+        Repinta solo los cuadros indicados sobre el pixmap mostrado,
+        sin volver a escalar toda la imagen.
+        """
+        color = QColor.fromRgb(rgb)
+        painter = QPainter(self.display_pixmap)
+        for x, y in cells:
+            rect = self.cell_rect(x, y)
+            painter.fillRect(rect, color)
+            # Restaurar los bordes de la cuadrícula de ese cuadro
+            painter.drawPixmap(rect, self.grid_overlay, rect)
+            self.update(rect)
+        painter.end()
+
+    def paintEvent(self, event):
+        # Copiar a pantalla solo la zona pendiente del pixmap ya preparado
+        painter = QPainter(self)
+        painter.drawPixmap(event.rect(), self.display_pixmap, event.rect())
         painter.end()
-        self.setPixmap(pixmap)
 
     def save_image(self):
         """
         Guarda la imagen como PNG de 1080x1080 sin cuadrícula.
         """
+        # Los diálogos se importan al usarlos, no al arrancar
+        from PyQt6.QtWidgets import QFileDialog
         filename, _ = QFileDialog.getSaveFileName(self, "Guardar imagen", "", "PNG Files (*.png)")
         if filename:
-            scaled = self.image.scaled(1080, 1080,
-                                       Qt.AspectRatioMode.IgnoreAspectRatio,
-                                       Qt.TransformationMode.FastTransformation)
-            scaled.save(filename)
+            # Solo se vuelve a escalar si se ha pintado algo desde la última vez
+            if self._export_cache is None:
+                self._export_cache = self.image.scaled(1080, 1080,
+                                                       Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                       Qt.TransformationMode.FastTransformation)
+            self._export_cache.save(filename)
 
     def change_color(self):
         """
         Abre un diálogo para cambiar el color del pincel.
         """
+        from PyQt6.QtWidgets import QColorDialog
         color = QColorDialog.getColor(initial=self.brush_color, title="Selecciona un color 🎨")
         if color.isValid():
             self.brush_color = color
+            self.brush_rgb = color.rgb()
 
 
 class PixelArtApp(QWidget):
@@ -133,6 +335,8 @@ class PixelArtApp(QWidget):
         # Botones principales
         self.save_btn = QPushButton("💾 Guardar como PNG (1080x1080)")
         self.color_btn = QPushButton("🎨 Cambiar color del pincel")
+        self.fill_btn = QPushButton("🪣 Rellenar área")
+        self.fill_btn.setCheckable(True)
         self.theme_btn = QPushButton("🌈 Cambiar tema")
         self.reset_btn = QPushButton("🔄 Restablecer tema")
 
@@ -142,17 +346,27 @@ class PixelArtApp(QWidget):
             "button_color": "#b57edc",   # color de botones morados
             "font": "Comic Sans MS"      # fuente divertida
         }
+        # Valores del último estilo aplicado, para no recalcular las hojas de estilo de Qt
+        self._applied_sig = None
+        # Último contenido escrito (o leído) de config.json, para no reescribirlo igual
+        self._last_saved_json = None
         # Cargar estilo actual desde config.json
         self.current_style = self.load_config()
+        # Los cambios de tema seguidos se guardan juntos tras una breve pausa
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(250)
+        self._save_timer.timeout.connect(self.save_config)
 
         # Conectar botones a sus funciones
         self.save_btn.clicked.connect(self.canvas.save_image)
         self.color_btn.clicked.connect(self.canvas.change_color)
+        self.fill_btn.toggled.connect(self.canvas.set_fill_mode)
         self.theme_btn.clicked.connect(self.change_theme)
         self.reset_btn.clicked.connect(self.reset_theme)
 
         # Añadir botones al layout
-        for btn in [self.save_btn, self.color_btn, self.theme_btn, self.reset_btn]:
+        for btn in [self.save_btn, self.color_btn, self.fill_btn, self.theme_btn, self.reset_btn]:
             self.layout.addWidget(btn)
 
         self.setLayout(self.layout)
@@ -165,8 +379,12 @@ class PixelArtApp(QWidget):
         Aplica el estilo actual a la ventana y botones.
         """
         style = self.current_style
+        sig = (style["window_color"], style["button_color"], style["font"])
+        if sig == self._applied_sig:
+            return
+        self._applied_sig = sig
         self.setStyleSheet(f"background-color: {style['window_color']}; font-family: {style['font']}; color: #4b0082;")
-        for btn in [self.save_btn, self.color_btn, self.theme_btn, self.reset_btn]:
+        for btn in [self.save_btn, self.color_btn, self.fill_btn, self.theme_btn, self.reset_btn]:
             btn.setStyleSheet(f"background-color: {style['button_color']}; border-radius: 8px; padding: 6px; font-family: {style['font']}; color: white;")
 
     def change_theme(self):
@@ -176,9 +394,10 @@ class PixelArtApp(QWidget):
         - Color de botones
         - Fuente
         """
-        window_color = QColorDialog.getColor(QColor(self.current_style["window_color"]), title="Color de ventana")
-        button_color = QColorDialog.getColor(QColor(self.current_style["button_color"]), title="Color de botones")
-        font, ok = QFontDialog.getFont(QFont(self.current_style["font"]))
+        from PyQt6.QtWidgets import QColorDialog, QFontDialog
+        window_color = QColorDialog.getColor(_qcolor(self.current_style["window_color"]), title="Color de ventana")
+        button_color = QColorDialog.getColor(_qcolor(self.current_style["button_color"]), title="Color de botones")
+        font, ok = QFontDialog.getFont(_qfont(self.current_style["font"]))
         if window_color.isValid():
             self.current_style["window_color"] = window_color.name()
         if button_color.isValid():
@@ -186,7 +405,7 @@ class PixelArtApp(QWidget):
         if ok:
             self.current_style["font"] = font.family()
         self.apply_style()
-        self.save_config()
+        self._save_timer.start()
 
     def reset_theme(self):
         """
@@ -194,14 +413,26 @@ class PixelArtApp(QWidget):
         """
         self.current_style = self.default_style.copy()
         self.apply_style()
-        self.save_config()
+        self._save_timer.start()
+
+    def closeEvent(self, event):
+        # Guardar un cambio de tema pendiente antes de cerrar
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            self.save_config()
+        super().closeEvent(event)
 
     def save_config(self):
         """
-        Guarda la configuración actual en config.json.
+        Guarda la configuración actual en config.json,
+        salvo que sea igual a lo último que se escribió.
         """
+        payload = json.dumps(self.current_style)
+        if payload == self._last_saved_json:
+            return
         with open(CONFIG_FILE, "w") as f:
-            json.dump(self.current_style, f)
+            f.write(payload)
+        self._last_saved_json = payload
 
     def load_config(self):
         """
@@ -209,7 +440,9 @@ class PixelArtApp(QWidget):
         """
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
+                style = json.load(f)
+            self._last_saved_json = json.dumps(style)
+            return style
         return self.default_style.copy()
 
 